@@ -1,9 +1,7 @@
 #!/usr/bin/env python3
 """CLI entrypoint for ingest pipeline."""
 import argparse
-import logging
 import os
-import shutil
 import sys
 from datetime import datetime, timezone
 
@@ -13,61 +11,12 @@ MODULES_DIR = os.path.join(PROJECT_ROOT, 'modules')
 if MODULES_DIR not in sys.path:
     sys.path.insert(0, MODULES_DIR)
 
-from variables import SRC, DST, SKIPPED, SUBDIR_MODE, required_metadata_tags
+from variables import SRC, DST, SOCKET_PATH, WORKERS
 from modules.logging_utils import setup_logging
-from modules.metadata import load_preset_for_code, MetadataPresetError
-from modules.planner import build_plan
-from modules.fileops import move_file
-from modules.exifwriter import has_exiftool, write_metadata_to_file
-from modules.filechecks import delete_empty_dirs, is_image_file, get_metadata_tags, has_required_metadata
-from modules.imageops import create_jpg_derivative
-
-# === Logging setup ===
-now = datetime.now(timezone.utc).astimezone()
-date_suffix = now.strftime("%Y-%m-%dT%H%M%S")
-log_dir = os.path.join(DST, "__log__")
-os.makedirs(log_dir, exist_ok=True)
-log_file = os.path.join(log_dir, f"ingest_{date_suffix}.log")
-
-logger = setup_logging(log_file)
-logger.info("Starting ingest")
-logger.info(f"SRC={SRC} DST={DST}")
-
-
-def run_metadata_only(exif_args, dry_run):
-    """
-    Metadata-only mode:
-    - No validation
-    - No moving
-    - No skipped-files processing
-    - Only writes metadata to image files in SRC
-    """
-    logger.info("Running in metadata-only mode (no validation, no ingest logic)")
-
-    if not has_exiftool():
-        logger.error("exiftool not available — cannot write metadata")
-        sys.exit(2)
-
-    # Walk SRC and write metadata to all TIFF/JPEG files
-    for dirpath, _, filenames in os.walk(SRC):
-        # Skip skipped folders and log folder
-        if os.path.basename(dirpath).startswith("skipped"):
-            continue
-        if "__log__" in dirpath:
-            continue
-
-        for fname in filenames:
-            if not is_image_file(fname):
-                continue
-
-            fullpath = os.path.join(dirpath, fname)
-            logger.info("Writing metadata to %s", fullpath)
-
-            write_metadata_to_file(fullpath, exif_args, dry_run=dry_run, logger=logger)
-
-    logger.info("metadata-only completed")
-    return
-
+from modules.exifwriter import exiftool_session
+from modules.pipeline import run_ingest, IngestError
+from modules.hashindex import rebuild_index
+from modules.derivatives import rebuild_derivatives
 
 def main():
     parser = argparse.ArgumentParser(description="Modular ingest pipeline")
@@ -75,118 +24,58 @@ def main():
     parser.add_argument('--skip-metadata', action='store_true')
     parser.add_argument('--metadata-only', action='store_true')
     parser.add_argument('--dry-run', action='store_true')
+    parser.add_argument('--serve', action='store_true', help='run as resident service (see ingest_client.py)')
+    parser.add_argument('--socket', default=SOCKET_PATH, help='Unix socket path for --serve')
+    parser.add_argument('--rebuild-index', action='store_true', help='index DST/primary for duplicate detection')
+    parser.add_argument('--rebuild-derivatives', action='store_true', help='regenerate stale or missing derivatives in DST')
+    parser.add_argument('--force', action='store_true', help='with --rebuild-derivatives: also regenerate derivatives made before settings were recorded')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='parallel workers for --rebuild-index / --rebuild-derivatives')
     args = parser.parse_args()
 
-    resources_dir = os.path.join(PROJECT_ROOT, 'resources')
-    exif_args = None
-
-    # === Load preset unless skipping metadata ===
-    if args.author_code and not args.skip_metadata:
-        try:
-            exif_args = load_preset_for_code(args.author_code, resources_dir, required_metadata_tags)
-            logger.info("Loaded preset for %s", args.author_code)
-        except MetadataPresetError as e:
-            logger.error("Preset load/validation failed: %s", e)
-            sys.exit(2)
-
-    # === Metadata-only compatibility check ===
-    if args.metadata_only and args.skip_metadata:
-        logger.error("--metadata-only and --skip-metadata cannot be used together")
-        sys.exit(2)
-
-    # === TRUE METADATA-ONLY MODE ===
-    mode_metadata_only = False
-
-    if args.metadata_only:
-        if not exif_args:
-            logger.error("metadata-only requested but no preset loaded")
-            sys.exit(2)
-
-        run_metadata_only(exif_args, dry_run=args.dry_run)
-        mode_metadata_only = True
-
-    # === Normal ingest mode ===
-    if not mode_metadata_only:
-        metadata_required = True
+    # === Logging setup ===
+    now = datetime.now(timezone.utc).astimezone()
+    date_suffix = now.strftime("%Y-%m-%dT%H%M%S")
+    log_dir = os.path.join(DST, "__log__")
+    os.makedirs(log_dir, exist_ok=True)
+    log_file = os.path.join(log_dir, f"ingest_{date_suffix}.log")
+
+    logger = setup_logging(log_file)
+    logger.info("Starting ingest")
+    logger.info(f"SRC={SRC} DST={DST}")
+
+    # === Duplicate index rebuild ===
+    if args.rebuild_index:
+        rebuild_index(DST, workers=args.workers, logger=logger)
+        return
+
+    # === Derivative rebuild ===
+    if args.rebuild_derivatives:
+        rebuild_derivatives(DST, workers=args.workers, force=args.force, dry_run=args.dry_run, logger=logger)
+        return
+
+    # === Resident service mode ===
+    if args.serve:
+        # Imported here: Unix sockets are not available on Windows
+        from modules.service import serve
+        if not serve(args.socket, logger):
+            sys.exit(1)
+        return
 
-        # Always create the skipped directory
-        skipped_dir = os.path.join(SRC, f"{SKIPPED}_{date_suffix}")
-        os.makedirs(skipped_dir, exist_ok=True)
-
-        plan, skipped = build_plan(SRC, DST, SUBDIR_MODE, logger)
-
-        # Move skipped files
-        if skipped:
-            for path, reason in skipped:
-                move_file(path, skipped_dir, reason, dry_run=args.dry_run, logger=logger)
-
-        logger.info("Planned operations: %d", len(plan))
-
-        # === Execute planned ingest ===
-        for item in plan:
-
-            # --- 1. PRE-VALIDATE METADATA WHEN --skip-metadata ---
-            if args.skip_metadata:
-                final_metadata = get_metadata_tags(item['src'])
-                if not has_required_metadata(final_metadata, item['fname'], required_metadata_tags):
-                    logger.error("Missing required metadata before processing (skip-metadata): %s", item['fname'])
-
-                    if not args.dry_run:
-                        move_file(item['src'], skipped_dir, 'missing required metadata', dry_run=args.dry_run, logger=logger)
-
-                    continue
-
-            # Create destination dirs
-            os.makedirs(os.path.dirname(item['dst']), exist_ok=True)
-            os.makedirs(item['derivative_dir'], exist_ok=True)
-
-            try:
-                # --- 3. MOVE ---
-                move_file(item['src'], item['dst'], 'validated move', dry_run=args.dry_run, logger=logger)
-                target_path = item['dst']
-
-                # --- 4. WRITE METADATA ---
-                if exif_args and not args.skip_metadata:
-                    if has_exiftool():
-                        write_metadata_to_file(target_path, exif_args, dry_run=args.dry_run, logger=logger)
-                    else:
-                        logger.error("exiftool missing — cannot write metadata")
-
-                # --- 5. POST-METADATA VALIDATION ---
-                if not args.skip_metadata:
-                    final_metadata = get_metadata_tags(target_path)
-                    if not has_required_metadata(final_metadata, item['fname'], required_metadata_tags):
-                        logger.error("Missing required metadata after write: %s", item['fname'])
-                        if not args.dry_run:
-                            move_file(target_path, skipped_dir, 'missing required metadata', dry_run=args.dry_run, logger=logger)
-                        continue
-
-                # --- 6. Derivative ---
-                if not args.dry_run:
-                    create_jpg_derivative(target_path, item['derivative_dir'], item['fname'], logger=logger)
-
-            except Exception as e:
-                logger.error("Operation failed for %s: %s", item['fname'], e)
-
-        # Cleanup skipped dir if empty
-        if os.path.exists(skipped_dir) and not os.listdir(skipped_dir):
-            try:
-                os.rmdir(skipped_dir)
-            except OSError:
-                pass
-
-    # === Always copy log to SRC ===
     try:
-        inlog = os.path.join(SRC, '__log__')
-        os.makedirs(inlog, exist_ok=True)
-        shutil.copy2(log_file, os.path.join(inlog, os.path.basename(log_file)))
-        logger.info("Copied log to %s", inlog)
-    except Exception:
-        logger.exception("Failed to copy log")
-
-    delete_empty_dirs(SRC, logger)
-    logger.info("Ingest done")
-
+        with exiftool_session():
+            run_ingest(
+                SRC, DST,
+                author_code=args.author_code,
+                skip_metadata=args.skip_metadata,
+                metadata_only=args.metadata_only,
+                dry_run=args.dry_run,
+                log_file=log_file,
+                date_suffix=date_suffix,
+                logger=logger,
+            )
+    except IngestError as e:
+        logger.error("%s", e)
+        sys.exit(2)
 
 
 if __name__ == '__main__':
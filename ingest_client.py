@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Thin client for the resident ingest service (ingest.py --serve)."""
+import argparse
+import json
+import socket
+import sys
+
+from variables import SOCKET_PATH
+
+
+def submit(request, socket_path=SOCKET_PATH):
+    """Send one request and yield the events streamed back by the service."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        with sock.makefile('rb') as stream:
+            for line in stream:
+                yield json.loads(line.decode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Submit a job to the resident ingest service")
+    parser.add_argument('author_code', nargs='?', default=None)
+    parser.add_argument('--src', default=None, help='source directory (default: service SRC)')
+    parser.add_argument('--dst', default=None, help='destination directory (default: service DST)')
+    parser.add_argument('--skip-metadata', action='store_true')
+    parser.add_argument('--metadata-only', action='store_true')
+    parser.add_argument('--dry-run', action='store_true')
+    parser.add_argument('--ping', action='store_true', help='check that the service is running')
+    parser.add_argument('--shutdown', action='store_true', help='stop the service')
+    parser.add_argument('--socket', default=SOCKET_PATH)
+    args = parser.parse_args()
+
+    if args.ping:
+        request = {'action': 'ping'}
+    elif args.shutdown:
+        request = {'action': 'shutdown'}
+    else:
+        request = {
+            'action': 'ingest',
+            'src': args.src,
+            'dst': args.dst,
+            'author_code': args.author_code,
+            'skip_metadata': args.skip_metadata,
+            'metadata_only': args.metadata_only,
+            'dry_run': args.dry_run,
+        }
+
+    try:
+        for event in submit(request, args.socket):
+            if event['event'] == 'log':
+                print(f"[{event['level']}] {event['message']}")
+            elif event['event'] == 'result':
+                print(json.dumps(event['summary']))
+                return 0
+            elif event['event'] == 'error':
+                print(f"error: {event['message']}", file=sys.stderr)
+                return 2
+    except OSError as e:
+        print(f"cannot reach ingest service at {args.socket}: {e}", file=sys.stderr)
+        return 1
+
+    print("connection closed before a result was received", file=sys.stderr)
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+Regenerate stale or missing derivatives for files already in DST/primary.
+
+A derivative is stale if it is missing, older than its primary, or was
+recorded with a different primary mtime or derivative settings hash
+(target ICC profiles + JPEG encoding, see imageops.derivative_settings_hash).
+State lives in DST/__index__/derivatives.sqlite and is committed as work
+completes, so an interrupted rebuild resumes where it stopped.
+"""
+import os
+import time
+import logging
+import sqlite3
+from multiprocessing.util import Finalize
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from variables import WORKERS
+from modules.filechecks import is_image_file
+from modules.imageops import create_jpg_derivative, derivative_settings_hash
+from modules.exifwriter import start_session
+
+INDEX_DIR = '__index__'
+INDEX_FILE = 'derivatives.sqlite'
+COMMIT_EVERY = 50
+PROGRESS_INTERVAL = 30  # seconds
+
+
+class DerivativeIndex:
+    """Records primary mtime and settings hash per derivative; paths are relative to DST/primary."""
+
+    def __init__(self, dst_root):
+        self.primary_root = os.path.join(dst_root, 'primary')
+        index_dir = os.path.join(dst_root, INDEX_DIR)
+        os.makedirs(index_dir, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(index_dir, INDEX_FILE))
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS derivatives ('
+            ' path TEXT PRIMARY KEY, primary_mtime REAL NOT NULL, settings_hash TEXT NOT NULL)'
+        )
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def relpath(self, primary_path):
+        return os.path.relpath(primary_path, self.primary_root)
+
+    def all(self):
+        return {row[0]: (row[1], row[2]) for row in self.db.execute('SELECT path, primary_mtime, settings_hash FROM derivatives')}
+
+    def record(self, primary_path, primary_mtime, settings_hash, commit=True):
+        self.db.execute(
+            'INSERT OR REPLACE INTO derivatives (path, primary_mtime, settings_hash) VALUES (?, ?, ?)',
+            (self.relpath(primary_path), primary_mtime, settings_hash),
+        )
+        if commit:
+            self.db.commit()
+
+
+def derivative_location(dst_root, primary_path):
+    """Return (derivative_dir, derivative_path) mirroring primary/<category>/<subdir>."""
+    rel_dir = os.path.relpath(os.path.dirname(primary_path), os.path.join(dst_root, 'primary'))
+    derivative_dir = os.path.join(dst_root, 'derivative', rel_dir)
+    fname = os.path.basename(primary_path)
+    return derivative_dir, os.path.join(derivative_dir, os.path.splitext(fname)[0] + '.jpg')
+
+
+def is_stale(primary_mtime, derivative_path, record, settings_hash, force=False):
+    """
+    force treats derivatives without a record as stale; recorded ones are
+    still skipped when they match, so a forced rebuild can resume too.
+    """
+    try:
+        derivative_mtime = os.path.getmtime(derivative_path)
+    except OSError:
+        return True
+    if derivative_mtime < primary_mtime:
+        return True
+    if record is None:
+        # Derivative predates the index: settings unknown, trust mtime unless forced
+        return force
+    recorded_mtime, recorded_hash = record
+    return recorded_mtime != primary_mtime or recorded_hash != settings_hash
+
+
+def _init_worker():
+    # Each worker gets its own exiftool process for copying metadata. Workers
+    # leave through os._exit, so close it from multiprocessing's exit hook
+    session = start_session()
+    if session is not None:
+        Finalize(session, session.close, exitpriority=10)
+
+
+class _CollectingHandler(logging.Handler):
+    """Keeps warnings and errors logged in a worker so the parent can log them."""
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append((record.levelno, record.getMessage()))
+
+
+def _derive(primary_path, derivative_dir):
+    """Returns (ok, [(level, message), ...]) logged while creating the derivative."""
+    # Workers have no handlers of their own (spawn) or inherited ones (fork); collect instead
+    logger = logging.getLogger('ingest.worker')
+    logger.propagate = False
+    handler = _CollectingHandler()
+    logger.addHandler(handler)
+    try:
+        ok = create_jpg_derivative(primary_path, derivative_dir, os.path.basename(primary_path), logger=logger) is not None
+    finally:
+        logger.removeHandler(handler)
+    return ok, handler.messages
+
+
+def find_stale_derivatives(dst_root, index, settings_hash, summary, force=False, logger=None):
+    """
+    Walk DST/primary and return [(primary_path, derivative_dir, primary_mtime)] needing a rebuild.
+
+    Counts checked and unreadable files in summary; unreadable ones are skipped.
+    """
+    if logger is None:
+        logger = logging.getLogger('ingest')
+
+    records = index.all()
+    todo = []
+    for dirpath, dirnames, filenames in os.walk(os.path.join(dst_root, 'primary')):
+        dirnames.sort()
+        for fname in sorted(filenames):
+            if not is_image_file(fname):
+                continue
+            primary_path = os.path.join(dirpath, fname)
+            try:
+                primary_mtime = os.path.getmtime(primary_path)
+            except OSError as e:
+                logger.warning("Derivatives: cannot stat %s: %s", primary_path, e)
+                summary['unreadable'] += 1
+                continue
+            derivative_dir, derivative_path = derivative_location(dst_root, primary_path)
+            summary['checked'] += 1
+            record = records.get(index.relpath(primary_path))
+            if is_stale(primary_mtime, derivative_path, record, settings_hash, force=force):
+                todo.append((primary_path, derivative_dir, primary_mtime))
+    return todo
+
+
+def rebuild_derivatives(dst_root, workers=WORKERS, force=False, dry_run=False, logger=None):
+    """
+    Regenerate stale or missing derivatives under DST/derivative across a process pool.
+
+    Returns a summary dict with counts of checked, unreadable, stale, rebuilt and failed files.
+    """
+    if logger is None:
+        logger = logging.getLogger('ingest')
+
+    settings_hash = derivative_settings_hash()
+    index = DerivativeIndex(dst_root)
+    summary = {'checked': 0, 'unreadable': 0, 'stale': 0, 'rebuilt': 0, 'failed': 0}
+    try:
+        todo = find_stale_derivatives(dst_root, index, settings_hash, summary, force=force, logger=logger)
+
+        summary['stale'] = len(todo)
+        logger.info("Derivatives: %d of %d primaries need a new derivative, %d unreadable (workers=%d)",
+                    len(todo), summary['checked'], summary['unreadable'], workers)
+        if dry_run or not todo:
+            for primary_path, _, _ in todo:
+                logger.info("[DRY-RUN] Would rebuild derivative for %s", primary_path)
+            return summary
+
+        mtimes = {primary_path: primary_mtime for primary_path, _, primary_mtime in todo}
+        start = last_report = time.monotonic()
+        done = 0
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = {
+                pool.submit(_derive, primary_path, derivative_dir): primary_path
+                for primary_path, derivative_dir, _ in todo
+            }
+            for future in as_completed(futures):
+                primary_path = futures[future]
+                try:
+                    ok, messages = future.result()
+                except Exception as e:
+                    ok, messages = False, [(logging.ERROR, f"worker failed: {e}")]
+                for level, message in messages:
+                    logger.log(level, "%s", message)
+                done += 1
+
+                if ok:
+                    summary['rebuilt'] += 1
+                    index.record(primary_path, mtimes[primary_path], settings_hash, commit=False)
+                else:
+                    summary['failed'] += 1
+                    logger.error("Failed to rebuild derivative for %s", primary_path)
+
+                now = time.monotonic()
+                if done % COMMIT_EVERY == 0:
+                    index.db.commit()
+                if now - last_report >= PROGRESS_INTERVAL:
+                    rate = done / (now - start)
+                    eta = (len(todo) - done) / rate if rate else 0
+                    logger.info("Derivatives: %d/%d done, %.2f files/s, ETA %.0f min",
+                                done, len(todo), rate, eta / 60)
+                    last_report = now
+
+        elapsed = time.monotonic() - start
+        logger.info("Derivatives rebuilt: %d ok, %d failed in %.1fs (%.2f files/s)",
+                    summary['rebuilt'], summary['failed'], elapsed, done / elapsed if elapsed else 0)
+        return summary
+    finally:
+        index.close()
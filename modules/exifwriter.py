@@ -1,17 +1,272 @@
+import os
+import json
+import queue
+import re
 import shutil
 import subprocess
 import logging
+import threading
+from contextlib import contextmanager
+
+# write_metadata_to_file results (both truthy, failures return False)
+WRITTEN = 'written'
+UNCHANGED = 'unchanged'
+
+# Files per exiftool call when reading current values in bulk
+READ_BATCH_SIZE = 200
+
+# exiftool prints {readyNUM} to stdout after each -executeNUM; we echo the
+# same marker plus the command's exit status to stderr with -echo4
+READY_MARKER = '{{ready{}}}'
+
+_session = None
+
 
 def has_exiftool():
     """Check if exiftool is available in PATH."""
     return shutil.which('exiftool') is not None
 
 
-def write_metadata_to_file(target_path, metadata_args, dry_run=False, logger=None):
+class ExifToolSession:
+    """
+    Long-running exiftool process driven through -stay_open.
+
+    Saves the Perl startup cost on every call; commands are serialised with a lock.
+    """
+
+    def __init__(self):
+        self.proc = None
+        self.lock = threading.Lock()
+        self.sequence = 0
+
+    def start(self):
+        self.proc = subprocess.Popen(
+            ['exiftool', '-stay_open', 'True', '-@', '-'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            text=True, encoding='utf-8',
+        )
+        # stderr is drained continuously so a chatty command cannot fill the
+        # pipe while we are still waiting on stdout
+        self.stderr_lines = queue.Queue()
+        threading.Thread(target=self._drain, args=(self.proc.stderr, self.stderr_lines), daemon=True).start()
+
+    @staticmethod
+    def _drain(stream, lines):
+        for line in stream:
+            lines.put(line)
+        lines.put('')
+
+    @staticmethod
+    def _read_until_marker(next_line, marker):
+        """Read up to the marker line; returns (text before it, rest of the marker line)."""
+        lines = []
+        while True:
+            line = next_line()
+            if not line:
+                raise RuntimeError('exiftool session terminated unexpectedly')
+            line = line.rstrip('\r\n')
+            if line.startswith(marker):
+                return ''.join(lines), line[len(marker):]
+            lines.append(line + '\n')
+
+    def execute(self, args):
+        """
+        Run one exiftool command; returns (returncode, stdout, stderr).
+
+        Arguments are sent one per line, so they must not contain line breaks.
+        A dead or out-of-sync process is killed and CalledProcessError raised;
+        the next call starts a fresh one.
+        """
+        with self.lock:
+            if self.proc is None or self.proc.poll() is not None:
+                self.start()
+            self.sequence += 1
+            marker = READY_MARKER.format(self.sequence)
+            payload = list(args) + ['-echo4', marker + '${status}', f'-execute{self.sequence}']
+            try:
+                self.proc.stdin.write('\n'.join(payload) + '\n')
+                self.proc.stdin.flush()
+                stdout, _ = self._read_until_marker(self.proc.stdout.readline, marker)
+                stderr, status = self._read_until_marker(self.stderr_lines.get, marker)
+            except (OSError, ValueError, RuntimeError) as e:
+                self.kill()
+                raise subprocess.CalledProcessError(-1, ['exiftool'] + list(args), stderr=f'exiftool session failed: {e}') from e
+
+        try:
+            returncode = int(status)
+        except ValueError:
+            # exiftool < 12.10 does not expand ${status}
+            returncode = 1 if any(line.startswith('Error') for line in stderr.splitlines()) else 0
+        return returncode, stdout, stderr
+
+    def kill(self):
+        if self.proc is None:
+            return
+        self.proc.kill()
+        self.proc.wait()
+        self.proc = None
+
+    def close(self):
+        if self.proc is None:
+            return
+        try:
+            self.proc.stdin.write('-stay_open\nFalse\n')
+            self.proc.stdin.flush()
+            self.proc.wait(timeout=10)
+        except Exception:
+            self.proc.kill()
+        self.proc = None
+
+
+@contextmanager
+def exiftool_session():
+    """Route run_exiftool() through one persistent exiftool process while active."""
+    global _session
+    if _session is not None or not has_exiftool():
+        yield _session
+        return
+    _session = ExifToolSession()
+    _session.start()
+    try:
+        yield _session
+    finally:
+        _session.close()
+        _session = None
+
+
+def start_session():
+    """
+    Start a process-wide exiftool session that lives until the process exits.
+
+    Meant for pool worker initializers; replaces any session inherited from
+    the parent process, whose pipes must not be shared.
+    """
+    global _session
+    _session = None
+    if has_exiftool():
+        _session = ExifToolSession()
+        _session.start()
+    return _session
+
+
+def run_exiftool(args):
+    """
+    Run exiftool with args, like subprocess.run(check=True).
+
+    Uses the active session if there is one. Raises CalledProcessError on failure.
+    """
+    cmd = ['exiftool'] + list(args)
+    # The session reads one argument per line; line breaks need a separate process
+    if _session is None or any('\n' in arg or '\r' in arg for arg in args):
+        return subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+
+    returncode, stdout, stderr = _session.execute(args)
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, cmd, output=stdout, stderr=stderr)
+    return subprocess.CompletedProcess(cmd, returncode, stdout, stderr)
+
+
+def split_metadata_args(metadata_args):
+    """Split exiftool args into (options, {tag: value}) for '-TAG=VALUE' assignments."""
+    options = []
+    assignments = {}
+    for arg in metadata_args:
+        if arg.startswith('-') and '=' in arg:
+            tag, value = arg[1:].split('=', 1)
+            assignments[tag] = value
+        else:
+            options.append(arg)
+    return options, assignments
+
+
+def _normalize_value(value):
+    # Single-item lists (dc:Creator etc.) come back in JSON form; numbers are
+    # kept as exiftool printed them by read_current_values
+    if isinstance(value, list):
+        value = value[0] if len(value) == 1 else ', '.join(str(v) for v in value)
+    return '' if value is None else str(value)
+
+
+# ISO 8601 as written in presets: YYYY-MM[-DD][THH:MM[:SS[.ss]]][Z|+HH:MM]
+_ISO_DATE = re.compile(
+    r'^(\d{4})-(\d{2})(?:-(\d{2}))?'
+    r'(?:[T ](\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?))?'
+    r'(Z|[+-]\d{2}:?\d{2})?$'
+)
+
+
+def _expected_value(tag, value):
+    """
+    Return a preset value in the form exiftool reads it back.
+
+    Date tags are read as 'YYYY:mm:dd HH:MM:SS'; a blank date is not
+    written at all, so it reads back as absent ('').
+    """
+    if 'Date' not in tag.split(':')[-1]:
+        return value
+    value = value.strip()
+    m = _ISO_DATE.match(value)
+    if not m:
+        return value
+    year, month, day, time, zone = m.groups()
+    result = ':'.join(part for part in (year, month, day) if part)
+    if time:
+        result += ' ' + time
+    if zone and zone != 'Z' and ':' not in zone:
+        zone = zone[:3] + ':' + zone[3:]
+    return result + (zone or '')
+
+
+def _path_key(path):
+    return os.path.normcase(os.path.normpath(path))
+
+
+def read_current_values(file_paths, tags):
+    """
+    Read the current values of tags (as 'GROUP:Tag') for many files.
+
+    Returns {path: {tag: value}} keyed by the paths as passed in; files are
+    read in batches of READ_BATCH_SIZE.
+    """
+    result = {}
+    tag_args = [f'-{tag}' for tag in tags]
+    for i in range(0, len(file_paths), READ_BATCH_SIZE):
+        batch = file_paths[i:i + READ_BATCH_SIZE]
+        # exiftool reports SourceFile in its own form (forward slashes on Windows)
+        by_key = {_path_key(p): p for p in batch}
+        proc = run_exiftool(['-j', '-G1', '-charset', 'filename=UTF8'] + tag_args + batch)
+        # Numbers stay strings as printed (4010, 1.10), matching the preset text
+        for entry in json.loads(proc.stdout or '[]', parse_int=str, parse_float=str):
+            source = entry.pop('SourceFile', None)
+            path = by_key.get(_path_key(source), source) if source else source
+            result[path] = {k: _normalize_value(v) for k, v in entry.items()}
+    return result
+
+
+def changed_metadata_args(metadata_args, current):
+    """
+    Return metadata_args reduced to the tags whose current value differs; None if nothing changes.
+
+    current: {tag: value} as read by read_current_values; absent tags count as ''.
     """
-    Write metadata using ExifTool.
+    options, assignments = split_metadata_args(metadata_args)
+    changed = [
+        f'-{tag}={value}' for tag, value in assignments.items()
+        if current.get(tag, '') != _expected_value(tag, value)
+    ]
+    if not changed:
+        return None
+    return options + changed
+
+
+def write_metadata_to_file(target_path, metadata_args, dry_run=False, logger=None, current=None):
+    """
+    Write metadata using ExifTool, skipping tags that already have the target value.
 
     metadata_args: list of strings like ['-Creator=Max Mustermann', ...]
+    current: {tag: value} of the file as read by read_current_values; read here if None.
+
+    Returns WRITTEN, UNCHANGED (file left untouched) or False on failure.
     """
     if logger is None:
         logger = logging.getLogger('ingest')
@@ -20,20 +275,36 @@ def write_metadata_to_file(target_path, metadata_args, dry_run=False, logger=Non
         logger.error('exiftool not found')
         return False
 
-    cmd = ['exiftool'] + metadata_args + [target_path]
+    if current is None:
+        _, assignments = split_metadata_args(metadata_args)
+        try:
+            current = read_current_values([target_path], list(assignments)).get(target_path, {})
+        except (subprocess.CalledProcessError, OSError, ValueError) as e:
+            logger.warning('Could not read current metadata of %s, writing all tags: %s', target_path, e)
+            current = {}
+
+    write_args = changed_metadata_args(metadata_args, current)
+    if write_args is None:
+        logger.info('Metadata unchanged, skipping write: %s', target_path)
+        return UNCHANGED
+
+    cmd = ['exiftool'] + write_args + [target_path]
     logger.info('Running exiftool: %s', ' '.join(cmd))
 
     if dry_run:
         logger.info('[DRY-RUN] exiftool call skipped')
-        return True
+        return WRITTEN
 
     try:
-        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+        proc = run_exiftool(write_args + [target_path])
         if proc.stdout:
             logger.info('exiftool stdout: %s', proc.stdout.strip())
         if proc.stderr:
             logger.warning('exiftool stderr: %s', proc.stderr.strip())
-        return True
+        return WRITTEN
     except subprocess.CalledProcessError as e:
         logger.error('exiftool failed: %s', e.stderr.strip() if e.stderr else str(e))
         return False
+    except OSError as e:
+        logger.error('exiftool failed: %s', e)
+        return False
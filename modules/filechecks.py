@@ -3,6 +3,7 @@ import re
 import logging
 from PIL import Image
 import io
+from functools import lru_cache
 
 # NOTE: This module expects variables.* lists to be passed into functions or imported by caller if needed.
 
@@ -31,11 +32,15 @@ def is_valid_date_segment(date_segment):
         return False
 
 
+@lru_cache(maxsize=None)
+def _compile_id_pattern(valid_initials):
+    return re.compile(rf"^\d{{7}}$|^[{valid_initials}]\d{{6}}$")
+
+
 def is_valid_id_segment(id_segment, valid_id_initial_chars):
-    valid_initials = ''.join(valid_id_initial_chars)
-    id_pattern = rf"^\d{{7}}$|^[{valid_initials}]\d{{6}}$"
+    id_pattern = _compile_id_pattern(''.join(valid_id_initial_chars))
     parts = id_segment.split('-')
-    return all(re.fullmatch(id_pattern, part) for part in parts)
+    return all(id_pattern.fullmatch(part) for part in parts)
 
 
 def is_valid_freetext_segment(freetext_segment):
@@ -137,9 +142,10 @@ def is_valid_icc_profile(metadata):
 
 
 def get_metadata_tags(file_path):
-    import subprocess, json
+    import json
+    from modules.exifwriter import run_exiftool
     try:
-        res = subprocess.run(['exiftool', '-j', file_path], capture_output=True, text=True, check=True)
+        res = run_exiftool(['-j', file_path])
         data = json.loads(res.stdout)
         return data[0] if data else {}
     except Exception as e:
@@ -1,10 +1,35 @@
 import os
+import errno
 import shutil
 import logging
 import subprocess
 
 
-def move_file(src, dst, reason, dry_run=False, logger=None):
+COPY_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def _move_hashed(src, dst, hasher):
+    """Move src to dst (a file path) feeding its content to hasher, reading it only once."""
+    try:
+        os.rename(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # Different filesystem: hash while copying
+        with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+            for chunk in iter(lambda: fin.read(COPY_CHUNK_SIZE), b''):
+                hasher.update(chunk)
+                fout.write(chunk)
+        shutil.copystat(src, dst)
+        os.unlink(src)
+        return
+    with open(dst, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(COPY_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+
+
+def move_file(src, dst, reason, dry_run=False, logger=None, hasher=None):
+    """Move src to dst; if a hashlib object is given, dst must be a file path and the content is hashed on the way."""
     if logger is None:
         logger = logging.getLogger('ingest')
     if dry_run:
@@ -12,7 +37,10 @@ def move_file(src, dst, reason, dry_run=False, logger=None):
         return
     os.makedirs(os.path.dirname(dst), exist_ok=True)
     try:
-        shutil.move(src, dst)
+        if hasher is None:
+            shutil.move(src, dst)
+        else:
+            _move_hashed(src, dst, hasher)
         logger.info('Moved: %s -> %s (%s)', src, dst, reason)
     except Exception as e:
         logger.error('Failed to move %s -> %s: %s', src, dst, e)
@@ -20,15 +48,20 @@ def move_file(src, dst, reason, dry_run=False, logger=None):
 
 
 def copy_metadata_with_exiftool(src_path, dst_path, logger=None):
+    """Copy all metadata from src_path to dst_path; returns True on success."""
     if logger is None:
         logger = logging.getLogger('ingest')
     if shutil.which('exiftool') is None:
         logger.warning('exiftool not found; cannot copy metadata')
-        return
-    cmd = ['exiftool', '-overwrite_original', '-TagsFromFile', src_path, '-All:All', dst_path]
+        return False
+    from modules.exifwriter import run_exiftool
     try:
-        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+        proc = run_exiftool(['-overwrite_original', '-TagsFromFile', src_path, '-All:All', dst_path])
         if proc.stdout:
             logger.debug('exiftool: %s', proc.stdout)
+        return True
     except subprocess.CalledProcessError as e:
-        logger.error('Exiftool failed copying metadata: %s', e.stderr)
\ No newline at end of file
+        logger.error('Exiftool failed copying metadata: %s', e.stderr)
+    except OSError as e:
+        logger.error('Exiftool failed copying metadata: %s', e)
+    return False
\ No newline at end of file
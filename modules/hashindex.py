@@ -0,0 +1,267 @@
+"""
+Persistent content-hash index of DST/primary, used to detect re-delivered duplicates.
+
+Files are compared in three steps, each only if the previous one matched:
+  1. size (from the index, no read)
+  2. quick hash of size + first and last block
+  3. full content hash (computed lazily for archive entries)
+"""
+import os
+import time
+import hashlib
+import logging
+import pathlib
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from variables import WORKERS
+from modules.filechecks import is_image_file
+
+INDEX_DIR = '__index__'
+INDEX_FILE = 'hashes.sqlite'
+BLOCK_SIZE = 64 * 1024
+READ_SIZE = 4 * 1024 * 1024
+
+# Where the hashed bytes came from: the file as delivered (before metadata
+# was written) or the file as it currently sits in the archive
+SOURCE_DELIVERED = 'delivered'
+SOURCE_ARCHIVE = 'archive'
+
+
+def quick_hash(file_path, size=None):
+    """Hash of size plus the first and last BLOCK_SIZE bytes."""
+    if size is None:
+        size = os.path.getsize(file_path)
+    h = hashlib.blake2b(str(size).encode('ascii'), digest_size=16)
+    with open(file_path, 'rb') as fh:
+        h.update(fh.read(BLOCK_SIZE))
+        if size > BLOCK_SIZE:
+            fh.seek(max(BLOCK_SIZE, size - BLOCK_SIZE))
+            h.update(fh.read(BLOCK_SIZE))
+    return h.hexdigest()
+
+
+def new_content_hasher():
+    """Hash object for full content hashes; pass to move_file to hash during the move."""
+    return hashlib.blake2b(digest_size=32)
+
+
+def full_hash(file_path):
+    h = new_content_hasher()
+    with open(file_path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(READ_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class HashIndex:
+    """
+    sqlite-backed index at DST/__index__/hashes.sqlite; paths are relative to DST.
+
+    Each row also records the size (file_size) and mtime of the file at its
+    path when it was last indexed or written, so rows for files that were
+    replaced or edited since can be recognised and dropped.
+
+    read_only (dry runs): never creates or modifies the index file.
+    """
+
+    def __init__(self, dst_root, logger=None, read_only=False):
+        self.dst_root = dst_root
+        self.logger = logger or logging.getLogger('ingest')
+        self.read_only = read_only
+        index_dir = os.path.join(dst_root, INDEX_DIR)
+        index_path = os.path.join(index_dir, INDEX_FILE)
+        if read_only:
+            if os.path.exists(index_path):
+                self.db = sqlite3.connect(pathlib.Path(index_path).resolve().as_uri() + '?mode=ro', uri=True)
+            else:
+                self.db = sqlite3.connect(':memory:')
+                self._create_tables()
+        else:
+            os.makedirs(index_dir, exist_ok=True)
+            self.db = sqlite3.connect(index_path)
+            self._create_tables()
+        # Files planned in the current run: [size, quick_hash, full_hash, src path], hashes filled lazily
+        self.pending = []
+
+    def _create_tables(self):
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS hashes ('
+            ' path TEXT NOT NULL, size INTEGER NOT NULL, mtime REAL,'
+            ' quick_hash TEXT NOT NULL, full_hash TEXT, source TEXT NOT NULL, file_size INTEGER,'
+            ' PRIMARY KEY (path, size, quick_hash))'
+        )
+        columns = {row[1] for row in self.db.execute('PRAGMA table_info(hashes)')}
+        if 'file_size' not in columns:
+            # Indexes from before file_size: rows without it count as stale
+            self.db.execute('ALTER TABLE hashes ADD COLUMN file_size INTEGER')
+        self.db.execute('CREATE INDEX IF NOT EXISTS hashes_size ON hashes (size, quick_hash)')
+        self.db.commit()
+
+    def _write(self, sql, params):
+        if self.read_only:
+            return
+        self.db.execute(sql, params)
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def relpath(self, path):
+        return os.path.relpath(path, self.dst_root)
+
+    def add(self, file_path, source=SOURCE_DELIVERED, full=None):
+        """
+        Record file_path (which must live under DST) in the index, replacing any rows for its path.
+
+        full: content hash if already known (e.g. computed during the move); hashed here otherwise.
+        """
+        st = os.stat(file_path)
+        quick = quick_hash(file_path, st.st_size)
+        if full is None:
+            full = full_hash(file_path)
+        if self.read_only:
+            return
+        rel = self.relpath(file_path)
+        self.db.execute('DELETE FROM hashes WHERE path = ?', (rel,))
+        self.db.execute(
+            'INSERT INTO hashes (path, size, mtime, quick_hash, full_hash, source, file_size) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (rel, st.st_size, st.st_mtime, quick, full, source, st.st_size),
+        )
+        self.db.commit()
+
+    def update_file_state(self, file_path):
+        """Record the current size and mtime of file_path, e.g. after writing metadata to it."""
+        st = os.stat(file_path)
+        self._write('UPDATE hashes SET file_size = ?, mtime = ? WHERE path = ?',
+                    (st.st_size, st.st_mtime, self.relpath(file_path)))
+
+    def remove(self, file_path):
+        self._write('DELETE FROM hashes WHERE path = ?', (self.relpath(file_path),))
+
+    def reserve(self, src_path):
+        """Remember a planned source file so later files in the same run are checked against it."""
+        self.pending.append([os.path.getsize(src_path), None, None, src_path])
+
+    def _is_current(self, path, file_size, mtime):
+        """True if the file at path still has the size and mtime recorded for it."""
+        try:
+            st = os.stat(os.path.join(self.dst_root, path))
+        except OSError:
+            return False
+        return st.st_size == file_size and st.st_mtime == mtime
+
+    def find_duplicate(self, file_path):
+        """Return the path (relative to DST, or the planned source path) of a file with identical content, else None."""
+        size = os.path.getsize(file_path)
+        rows = self.db.execute(
+            'SELECT path, mtime, quick_hash, full_hash, source, file_size FROM hashes WHERE size = ?', (size,)
+        ).fetchall()
+        pending = [p for p in self.pending if p[0] == size]
+        if not rows and not pending:
+            return None
+
+        quick = quick_hash(file_path, size)
+        rows = [r for r in rows if r[2] == quick]
+        for p in pending:
+            if p[1] is None:
+                p[1] = quick_hash(p[3], size)
+        pending = [p for p in pending if p[1] == quick]
+        if not rows and not pending:
+            return None
+
+        full = full_hash(file_path)
+        for path, mtime, row_quick, row_full, source, file_size in rows:
+            if not self._is_current(path, file_size, mtime):
+                # File was removed, replaced or edited since it was indexed
+                self._write('DELETE FROM hashes WHERE path = ?', (path,))
+                continue
+            if row_full is None and source == SOURCE_ARCHIVE:
+                row_full = full_hash(os.path.join(self.dst_root, path))
+                self._write('UPDATE hashes SET full_hash = ? WHERE path = ? AND size = ? AND quick_hash = ?',
+                            (row_full, path, size, row_quick))
+            if row_full == full:
+                return path
+        for p in pending:
+            if p[2] is None:
+                p[2] = full_hash(p[3])
+            if p[2] == full:
+                return p[3]
+        return None
+
+
+def _scan_archive_file(args):
+    file_path, size, mtime = args
+    try:
+        return file_path, size, mtime, quick_hash(file_path, size), None
+    except OSError as e:
+        return file_path, size, mtime, None, e
+
+
+def rebuild_index(dst_root, workers=WORKERS, logger=None):
+    """
+    Index every image under DST/primary that is not yet indexed at its current size and mtime.
+
+    Rows for files that changed since they were indexed, including delivered
+    rows of files replaced in the archive, are replaced by an archive row.
+
+    Only quick hashes are computed (in parallel); full hashes are filled in
+    lazily when a candidate duplicate needs them.
+    """
+    if logger is None:
+        logger = logging.getLogger('ingest')
+
+    index = HashIndex(dst_root, logger)
+    try:
+        # Files unchanged since they were indexed (at ingest or by an earlier rebuild)
+        known = set(index.db.execute('SELECT path, file_size, mtime FROM hashes'))
+        seen = set()
+        todo = []
+        for dirpath, _, filenames in os.walk(os.path.join(dst_root, 'primary')):
+            for fname in filenames:
+                if not is_image_file(fname):
+                    continue
+                fpath = os.path.join(dirpath, fname)
+                rel = index.relpath(fpath)
+                seen.add(rel)
+                try:
+                    st = os.stat(fpath)
+                except OSError as e:
+                    logger.warning("Hash index: cannot stat %s: %s", fpath, e)
+                    continue
+                if (rel, st.st_size, st.st_mtime) in known:
+                    continue
+                todo.append((fpath, st.st_size, st.st_mtime))
+
+        # Drop entries for files no longer in the archive
+        gone = {row[0] for row in index.db.execute('SELECT DISTINCT path FROM hashes')} - seen
+        index.db.executemany('DELETE FROM hashes WHERE path = ?', [(p,) for p in gone])
+        if gone:
+            logger.info("Hash index: removed %d entries for missing files", len(gone))
+
+        logger.info("Hash index: %d files to index", len(todo))
+        start = time.monotonic()
+        done = 0
+        errors = 0
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for fpath, size, mtime, quick, error in pool.map(_scan_archive_file, todo):
+                if error is not None:
+                    logger.warning("Hash index: cannot read %s: %s", fpath, error)
+                    errors += 1
+                    continue
+                rel = index.relpath(fpath)
+                # The file changed since its rows were written; they describe other content
+                index.db.execute('DELETE FROM hashes WHERE path = ?', (rel,))
+                index.db.execute(
+                    'INSERT INTO hashes (path, size, mtime, quick_hash, full_hash, source, file_size) VALUES (?, ?, ?, ?, NULL, ?, ?)',
+                    (rel, size, mtime, quick, SOURCE_ARCHIVE, size),
+                )
+                done += 1
+                if done % 1000 == 0:
+                    index.db.commit()
+                    logger.info("Hash index: %d/%d files", done, len(todo))
+        index.db.commit()
+        logger.info("Hash index rebuilt: %d files in %.1fs, %d unreadable", done, time.monotonic() - start, errors)
+        return done
+    finally:
+        index.close()
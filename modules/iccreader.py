@@ -0,0 +1,205 @@
+"""
+Minimal reader for the embedded ICC profile description.
+
+Finds the ICC profile in TIFF (tag 34675), JPEG (APP2 ICC_PROFILE) and PNG
+(iCCP) files and parses its 'desc' / 'mluc' tag without decoding pixels.
+Only the container headers and the profile's tag table are read.
+"""
+import os
+import struct
+import zlib
+import logging
+
+TIFF_ICC_TAG = 34675
+TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 16: 8, 17: 8, 18: 8}
+
+# Upper bound for a single description tag; real ones are well below 1 KB
+MAX_DESC_TAG_SIZE = 64 * 1024
+
+
+class ICCReadError(Exception):
+    pass
+
+
+def _read_exact(fh, offset, size):
+    fh.seek(offset)
+    data = fh.read(size)
+    if len(data) != size:
+        raise ICCReadError('unexpected end of file')
+    return data
+
+
+def parse_icc_description(read_at):
+    """
+    Return the profile description from an ICC profile.
+
+    read_at(offset, size) must return bytes relative to the profile start.
+    Returns '' if the profile has no description tag.
+    """
+    header = read_at(128, 4)
+    (tag_count,) = struct.unpack('>I', header)
+    if tag_count > 1024:
+        raise ICCReadError(f'implausible ICC tag count: {tag_count}')
+    table = read_at(132, 12 * tag_count)
+
+    for i in range(tag_count):
+        sig, offset, size = struct.unpack('>4sII', table[i * 12:(i + 1) * 12])
+        if sig != b'desc':
+            continue
+        data = read_at(offset, min(size, MAX_DESC_TAG_SIZE))
+        return _decode_desc_tag(data)
+    return ''
+
+
+def _decode_desc_tag(data):
+    type_sig = data[:4]
+
+    # ICC v2 textDescriptionType: ASCII count + string
+    if type_sig == b'desc':
+        (length,) = struct.unpack('>I', data[8:12])
+        return data[12:12 + length].split(b'\0', 1)[0].decode('latin-1').strip()
+
+    # ICC v4 multiLocalizedUnicodeType: prefer English, else first record
+    if type_sig == b'mluc':
+        count, record_size = struct.unpack('>II', data[8:16])
+        records = []
+        for i in range(count):
+            start = 16 + i * record_size
+            lang, country, length, offset = struct.unpack('>2s2sII', data[start:start + 12])
+            records.append((lang, country, length, offset))
+        if not records:
+            return ''
+        chosen = next((r for r in records if r[0] == b'en'), records[0])
+        _, _, length, offset = chosen
+        return data[offset:offset + length].decode('utf-16-be', errors='replace').rstrip('\0').strip()
+
+    raise ICCReadError(f'unsupported description tag type: {type_sig!r}')
+
+
+def _tiff_description(fh):
+    byte_order = fh.read(2)
+    if byte_order == b'II':
+        e = '<'
+    elif byte_order == b'MM':
+        e = '>'
+    else:
+        raise ICCReadError('not a TIFF file')
+
+    (magic,) = struct.unpack(e + 'H', fh.read(2))
+    if magic == 42:
+        (ifd_offset,) = struct.unpack(e + 'I', fh.read(4))
+        count_fmt, entry_fmt, entry_size, inline_size = 'H', 'HHI4s', 12, 4
+    elif magic == 43:
+        # BigTIFF
+        _, _, ifd_offset = struct.unpack(e + 'HHQ', fh.read(12))
+        count_fmt, entry_fmt, entry_size, inline_size = 'Q', 'HHQ8s', 20, 8
+    else:
+        raise ICCReadError('not a TIFF file')
+
+    count_size = struct.calcsize(count_fmt)
+    (entry_count,) = struct.unpack(e + count_fmt, _read_exact(fh, ifd_offset, count_size))
+    entries = _read_exact(fh, ifd_offset + count_size, entry_count * entry_size)
+
+    for i in range(entry_count):
+        tag, typ, count, value = struct.unpack(e + entry_fmt, entries[i * entry_size:(i + 1) * entry_size])
+        if tag != TIFF_ICC_TAG:
+            continue
+        size = count * TIFF_TYPE_SIZES.get(typ, 1)
+        if size <= inline_size:
+            profile = value[:size]
+            return parse_icc_description(lambda o, s: profile[o:o + s])
+        (base,) = struct.unpack(e + ('I' if inline_size == 4 else 'Q'), value)
+        return parse_icc_description(lambda o, s: _read_exact(fh, base + o, s))
+    return ''
+
+
+def _jpeg_description(fh):
+    if fh.read(2) != b'\xff\xd8':
+        raise ICCReadError('not a JPEG file')
+
+    chunks = {}
+    chunk_count = None
+    while True:
+        if fh.read(1) != b'\xff':
+            # Truncated or not at a marker: let exiftool decide
+            return None
+        code = fh.read(1)
+        # Any number of 0xFF fill bytes may precede a marker
+        while code == b'\xff':
+            code = fh.read(1)
+        if not code:
+            return None
+        marker = code[0]
+        # Start of scan / end of image: no more metadata segments
+        if marker in (0xDA, 0xD9):
+            break
+        # Standalone markers (TEM, RSTn) carry no length
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            continue
+        length_bytes = fh.read(2)
+        if len(length_bytes) < 2:
+            return None
+        (length,) = struct.unpack('>H', length_bytes)
+        if marker == 0xE2:
+            payload = fh.read(length - 2)
+            if payload.startswith(b'ICC_PROFILE\0'):
+                chunks[payload[12]] = payload[14:]
+                chunk_count = payload[13]
+        else:
+            fh.seek(length - 2, os.SEEK_CUR)
+
+    if not chunks:
+        return ''
+    if len(chunks) != chunk_count:
+        # Incomplete multi-segment profile
+        return None
+    profile = b''.join(chunks[k] for k in sorted(chunks))
+    return parse_icc_description(lambda o, s: profile[o:o + s])
+
+
+def _png_description(fh):
+    if fh.read(8) != b'\x89PNG\r\n\x1a\n':
+        raise ICCReadError('not a PNG file')
+
+    while True:
+        head = fh.read(8)
+        if len(head) < 8:
+            # Truncated before image data: let exiftool decide
+            return None
+        length, chunk_type = struct.unpack('>I4s', head)
+        if chunk_type in (b'IDAT', b'IEND'):
+            break
+        if chunk_type == b'iCCP':
+            data = fh.read(length)
+            _, rest = data.split(b'\0', 1)
+            profile = zlib.decompress(rest[1:])
+            return parse_icc_description(lambda o, s: profile[o:o + s])
+        fh.seek(length + 4, os.SEEK_CUR)
+    return ''
+
+
+READERS = {
+    '.tif': _tiff_description,
+    '.tiff': _tiff_description,
+    '.jpg': _jpeg_description,
+    '.jpeg': _jpeg_description,
+    '.png': _png_description,
+}
+
+
+def read_icc_description(file_path):
+    """
+    Return the embedded ICC profile description of an image file.
+
+    Returns '' if the file has no embedded profile and None if the format is
+    not handled or the file could not be parsed (callers fall back to exiftool).
+    """
+    reader = READERS.get(os.path.splitext(file_path)[1].lower())
+    if reader is None:
+        return None
+    try:
+        with open(file_path, 'rb') as fh:
+            return reader(fh)
+    except (OSError, ICCReadError, struct.error, zlib.error, ValueError, IndexError, KeyError) as e:
+        logging.debug('%s: native ICC read failed: %s', file_path, e)
+        return None
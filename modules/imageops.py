@@ -1,11 +1,32 @@
 import os
 import io
+import hashlib
 import logging
+from functools import lru_cache
 from PIL import Image, ImageCms
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 SRGB_ICC = os.path.join(BASE_DIR, 'resources', 'sRGB_IEC61966-2-1.icc')
 GRAY_ICC = os.path.join(BASE_DIR, 'resources', 'Gray-Gamma-2-2.icc')
+JPEG_QUALITY = 100
+
+
+@lru_cache(maxsize=None)
+def load_target_profile(path):
+    """Load a target ICC profile once per process; returns (profile, bytes)."""
+    target = ImageCms.ImageCmsProfile(path)
+    return target, target.tobytes()
+
+
+@lru_cache(maxsize=None)
+def derivative_settings_hash():
+    """Fingerprint of everything that determines a derivative: target profiles and encoding."""
+    h = hashlib.blake2b(digest_size=16)
+    for path in (SRGB_ICC, GRAY_ICC):
+        with open(path, 'rb') as fh:
+            h.update(fh.read())
+    h.update(f'JPEG quality={JPEG_QUALITY}'.encode('ascii'))
+    return h.hexdigest()
 
 
 def convert_to_target_profile(img, file_name):
@@ -13,10 +34,9 @@ def convert_to_target_profile(img, file_name):
     mode = img.mode
     try:
         if mode == 'L':
-            target = ImageCms.ImageCmsProfile(GRAY_ICC)
+            target, target_bytes = load_target_profile(GRAY_ICC)
         else:
-            target = ImageCms.ImageCmsProfile(SRGB_ICC)
-        target_bytes = target.tobytes()
+            target, target_bytes = load_target_profile(SRGB_ICC)
         if icc:
             input_profile = ImageCms.ImageCmsProfile(io.BytesIO(icc))
             converted = ImageCms.profileToProfile(img, input_profile, target, outputMode=mode, renderingIntent=0)
@@ -31,6 +51,7 @@ def convert_to_target_profile(img, file_name):
 
 
 def create_jpg_derivative(src_image_path, dst_directory, file_name, logger=None):
+    """Create the JPEG derivative; returns its path, or None on failure."""
     if logger is None:
         logger = logging.getLogger('ingest')
     try:
@@ -39,13 +60,19 @@ def create_jpg_derivative(src_image_path, dst_directory, file_name, logger=None)
         converted = convert_to_target_profile(original.copy(), file_name)
         os.makedirs(dst_directory, exist_ok=True)
         dst_jpg = os.path.join(dst_directory, os.path.splitext(file_name)[0] + '.jpg')
-        converted.save(dst_jpg, 'JPEG', quality=100, icc_profile=converted.info.get('icc_profile', b''))
+        converted.save(dst_jpg, 'JPEG', quality=JPEG_QUALITY, icc_profile=converted.info.get('icc_profile', b''))
         logger.info('Saved derivative: %s', dst_jpg)
         # copy metadata from primary to derivative
         from modules.fileops import copy_metadata_with_exiftool
-        copy_metadata_with_exiftool(src_image_path, dst_jpg, logger=logger)
+        if not copy_metadata_with_exiftool(src_image_path, dst_jpg, logger=logger):
+            # Remove it so the derivative counts as missing and is rebuilt later
+            os.remove(dst_jpg)
+            logger.error('Failed to create derivative for %s: metadata not copied', file_name)
+            return None
+        return dst_jpg
     except Exception as e:
         logger.error('Failed to create derivative for %s: %s', file_name, e)
+        return None
 
 
 def can_create_jpg_derivative(src_image_path, file_name):
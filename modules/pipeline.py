@@ -0,0 +1,244 @@
+import os
+import shutil
+import logging
+import sqlite3
+from datetime import datetime, timezone
+
+from variables import SKIPPED, SUBDIR_MODE, DUPLICATE_MODE, required_metadata_tags
+from modules.metadata import load_preset_for_code, MetadataPresetError
+from modules.planner import build_plan
+from modules.fileops import move_file
+from modules.exifwriter import (
+    has_exiftool,
+    write_metadata_to_file,
+    read_current_values,
+    split_metadata_args,
+    UNCHANGED,
+)
+from modules.filechecks import delete_empty_dirs, is_image_file, get_metadata_tags, has_required_metadata
+from modules.imageops import create_jpg_derivative, derivative_settings_hash
+from modules.hashindex import HashIndex, new_content_hasher
+from modules.derivatives import DerivativeIndex
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+RESOURCES_DIR = os.path.join(BASE_DIR, 'resources')
+
+
+class IngestError(Exception):
+    pass
+
+
+def run_metadata_only(src, exif_args, dry_run, logger=None):
+    """
+    Metadata-only mode:
+    - No validation
+    - No moving
+    - No skipped-files processing
+    - Only writes metadata to image files in SRC
+    """
+    if logger is None:
+        logger = logging.getLogger('ingest')
+    logger.info("Running in metadata-only mode (no validation, no ingest logic)")
+
+    if not has_exiftool():
+        raise IngestError("exiftool not available — cannot write metadata")
+
+    counts = {'written': 0, 'unchanged': 0}
+    _, assignments = split_metadata_args(exif_args)
+
+    # Walk SRC and write metadata to all TIFF/JPEG files
+    for dirpath, _, filenames in os.walk(src):
+        # Skip skipped folders and log folder
+        if os.path.basename(dirpath).startswith("skipped"):
+            continue
+        if "__log__" in dirpath:
+            continue
+
+        paths = [os.path.join(dirpath, f) for f in filenames if is_image_file(f)]
+        if not paths:
+            continue
+
+        # Read current values for the whole directory at once
+        try:
+            current_values = read_current_values(paths, list(assignments))
+        except Exception as e:
+            logger.warning("Batched metadata read failed in %s, reading per file: %s", dirpath, e)
+            current_values = {}
+
+        for fullpath in paths:
+            logger.info("Writing metadata to %s", fullpath)
+
+            result = write_metadata_to_file(fullpath, exif_args, dry_run=dry_run, logger=logger,
+                                            current=current_values.get(fullpath))
+            if result == UNCHANGED:
+                counts['unchanged'] += 1
+            elif result:
+                counts['written'] += 1
+
+    logger.info("metadata-only completed")
+    return counts
+
+
+def run_ingest(src, dst, author_code=None, skip_metadata=False, metadata_only=False, dry_run=False,
+               log_file=None, date_suffix=None, logger=None, resources_dir=RESOURCES_DIR):
+    """
+    Run one ingest job from src into dst and return a summary dict.
+
+    Used by the CLI and by the resident service; raises IngestError where the
+    CLI used to exit with status 2.
+    """
+    if logger is None:
+        logger = logging.getLogger('ingest')
+    if date_suffix is None:
+        date_suffix = datetime.now(timezone.utc).astimezone().strftime("%Y-%m-%dT%H%M%S")
+
+    summary = {'planned': 0, 'skipped': 0, 'ingested': 0, 'failed': 0,
+               'metadata_written': 0, 'metadata_unchanged': 0}
+    exif_args = None
+
+    # === Load preset unless skipping metadata ===
+    if author_code and not skip_metadata:
+        try:
+            exif_args = load_preset_for_code(author_code, resources_dir, required_metadata_tags)
+            logger.info("Loaded preset for %s", author_code)
+        except MetadataPresetError as e:
+            raise IngestError(f"Preset load/validation failed: {e}") from e
+
+    # === Metadata-only compatibility check ===
+    if metadata_only and skip_metadata:
+        raise IngestError("--metadata-only and --skip-metadata cannot be used together")
+
+    # === TRUE METADATA-ONLY MODE ===
+    if metadata_only:
+        if not exif_args:
+            raise IngestError("metadata-only requested but no preset loaded")
+
+        counts = run_metadata_only(src, exif_args, dry_run=dry_run, logger=logger)
+        summary['metadata_written'] = counts['written']
+        summary['metadata_unchanged'] = counts['unchanged']
+
+    # === Normal ingest mode ===
+    else:
+        # Always create the skipped directory
+        skipped_dir = os.path.join(src, f"{SKIPPED}_{date_suffix}")
+        os.makedirs(skipped_dir, exist_ok=True)
+
+        hash_index = None
+        derivative_index = None
+        try:
+            hash_index = HashIndex(dst, logger, read_only=dry_run) if DUPLICATE_MODE != 'off' else None
+            plan, skipped = build_plan(src, dst, SUBDIR_MODE, logger, hash_index=hash_index, duplicate_mode=DUPLICATE_MODE)
+            derivative_index = DerivativeIndex(dst) if plan and not dry_run else None
+            summary['planned'] = len(plan)
+            summary['skipped'] = len(skipped)
+
+            # Move skipped files
+            if skipped:
+                for path, reason in skipped:
+                    move_file(path, skipped_dir, reason, dry_run=dry_run, logger=logger)
+
+            logger.info("Planned operations: %d", len(plan))
+
+            # === Execute planned ingest ===
+            for item in plan:
+
+                # --- 1. PRE-VALIDATE METADATA WHEN --skip-metadata ---
+                if skip_metadata:
+                    final_metadata = get_metadata_tags(item['src'])
+                    if not has_required_metadata(final_metadata, item['fname'], required_metadata_tags):
+                        logger.error("Missing required metadata before processing (skip-metadata): %s", item['fname'])
+                        summary['skipped'] += 1
+
+                        if not dry_run:
+                            move_file(item['src'], skipped_dir, 'missing required metadata', dry_run=dry_run, logger=logger)
+
+                        continue
+
+                # Create destination dirs
+                os.makedirs(os.path.dirname(item['dst']), exist_ok=True)
+                os.makedirs(item['derivative_dir'], exist_ok=True)
+
+                try:
+                    # --- 3. MOVE ---
+                    # Content is hashed during the move so indexing needs no extra full read
+                    hasher = new_content_hasher() if hash_index is not None else None
+                    move_file(item['src'], item['dst'], 'validated move', dry_run=dry_run, logger=logger, hasher=hasher)
+                    target_path = item['dst']
+
+                    # Index the delivered bytes, before metadata is written
+                    if hash_index is not None and not dry_run:
+                        try:
+                            hash_index.add(target_path, full=hasher.hexdigest())
+                        except (OSError, sqlite3.Error) as e:
+                            logger.warning("Could not add %s to the duplicate index: %s", item['fname'], e)
+
+                    # --- 4. WRITE METADATA ---
+                    if exif_args and not skip_metadata:
+                        if has_exiftool():
+                            result = write_metadata_to_file(target_path, exif_args, dry_run=dry_run, logger=logger)
+                            if result == UNCHANGED:
+                                summary['metadata_unchanged'] += 1
+                            elif result:
+                                summary['metadata_written'] += 1
+                        else:
+                            logger.error("exiftool missing — cannot write metadata")
+
+                    # The delivered row must match the file as it is now, or it reads as replaced
+                    if hash_index is not None and not dry_run:
+                        try:
+                            hash_index.update_file_state(target_path)
+                        except (OSError, sqlite3.Error) as e:
+                            logger.warning("Could not update %s in the duplicate index: %s", item['fname'], e)
+
+                    # --- 5. POST-METADATA VALIDATION ---
+                    if not skip_metadata:
+                        final_metadata = get_metadata_tags(target_path)
+                        if not has_required_metadata(final_metadata, item['fname'], required_metadata_tags):
+                            logger.error("Missing required metadata after write: %s", item['fname'])
+                            summary['skipped'] += 1
+                            if not dry_run:
+                                if hash_index is not None:
+                                    hash_index.remove(target_path)
+                                move_file(target_path, skipped_dir, 'missing required metadata', dry_run=dry_run, logger=logger)
+                            continue
+
+                    # --- 6. Derivative ---
+                    if not dry_run:
+                        if create_jpg_derivative(target_path, item['derivative_dir'], item['fname'], logger=logger):
+                            derivative_index.record(target_path, os.path.getmtime(target_path), derivative_settings_hash())
+
+                    summary['ingested'] += 1
+
+                except Exception as e:
+                    logger.error("Operation failed for %s: %s", item['fname'], e)
+                    summary['failed'] += 1
+        finally:
+            if hash_index is not None:
+                hash_index.close()
+            if derivative_index is not None:
+                derivative_index.close()
+
+        # Cleanup skipped dir if empty
+        if os.path.exists(skipped_dir) and not os.listdir(skipped_dir):
+            try:
+                os.rmdir(skipped_dir)
+            except OSError:
+                pass
+
+    # === Always copy log to SRC ===
+    if log_file:
+        try:
+            inlog = os.path.join(src, '__log__')
+            os.makedirs(inlog, exist_ok=True)
+            shutil.copy2(log_file, os.path.join(inlog, os.path.basename(log_file)))
+            logger.info("Copied log to %s", inlog)
+        except Exception:
+            logger.exception("Failed to copy log")
+
+    if exif_args:
+        logger.info("Metadata: %d files written, %d unchanged (skipped)",
+                    summary['metadata_written'], summary['metadata_unchanged'])
+
+    delete_empty_dirs(src, logger)
+    logger.info("Ingest done")
+    return summary
@@ -1,4 +1,5 @@
 import os
+import sqlite3
 from modules.filechecks import (
     get_destination_subdir,
     is_image_file,
@@ -7,16 +8,20 @@ from modules.filechecks import (
     is_valid_icc_profile
 )
 from modules.imageops import can_create_jpg_derivative
+from modules.iccreader import read_icc_description
 
 
-def build_plan(src_root, dst_root, subdir_mode, logger):
+def build_plan(src_root, dst_root, subdir_mode, logger, hash_index=None, duplicate_mode="skip"):
     """
     Planner validates:
       - file type
       - filename
       - ICC profile
+      - duplicate content (if a hash_index is given)
       - derivative creation
     It does NOT validate metadata anymore (validation happens post-write).
+
+    duplicate_mode: "skip" moves duplicates to skipped, "flag" only logs them.
     """
 
     planned = []
@@ -65,12 +70,16 @@ def build_plan(src_root, dst_root, subdir_mode, logger):
 
             # Metadata NOT validated here anymore
 
-            # ICC profile check
-            try:
-                metadata = get_metadata_tags(fpath)
-            except Exception:
-                skipped.append((fpath, "metadata read error"))
-                continue
+            # ICC profile check: native header read, exiftool for formats it doesn't handle
+            icc_description = read_icc_description(fpath)
+            if icc_description is not None:
+                metadata = {"ProfileDescription": icc_description}
+            else:
+                try:
+                    metadata = get_metadata_tags(fpath)
+                except Exception:
+                    skipped.append((fpath, "metadata read error"))
+                    continue
 
             icc_ok, icc_reason = is_valid_icc_profile(metadata)
             if not icc_ok:
@@ -87,12 +96,27 @@ def build_plan(src_root, dst_root, subdir_mode, logger):
                 skipped.append((fpath, "exists at destination"))
                 continue
 
+            # Duplicate content check
+            if hash_index is not None:
+                try:
+                    duplicate_of = hash_index.find_duplicate(fpath)
+                except (OSError, sqlite3.Error) as e:
+                    logger.warning("%s: duplicate check failed: %s", fname, e)
+                    duplicate_of = None
+                if duplicate_of:
+                    if duplicate_mode == "skip":
+                        skipped.append((fpath, f"duplicate of {duplicate_of}"))
+                        continue
+                    logger.warning("%s: duplicate of %s", fname, duplicate_of)
+
             # Derivative check
             if not can_create_jpg_derivative(fpath, fname):
                 skipped.append((fpath, "cannot create derivative"))
                 continue
 
             # Add to plan
+            if hash_index is not None:
+                hash_index.reserve(fpath)
             planned.append(
                 {
                     "src": fpath,
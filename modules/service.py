@@ -0,0 +1,167 @@
+"""
+Resident ingest service.
+
+Keeps Pillow, the parsed resources, loaded ICC profiles and an exiftool
+session warm, and runs ingest jobs submitted over a Unix domain socket.
+
+Protocol: newline-delimited JSON. The client sends one request object,
+  {"action": "ingest", "src": ..., "dst": ..., "author_code": ...,
+   "skip_metadata": false, "metadata_only": false, "dry_run": false}
+  {"action": "ping"}
+  {"action": "shutdown"}
+and the server answers with a stream of events:
+  {"event": "log", "level": "INFO", "message": ...}
+  {"event": "result", "ok": true, "summary": {...}}
+  {"event": "error", "message": ...}
+"""
+import os
+import json
+import socket
+import logging
+import socketserver
+import threading
+from datetime import datetime, timezone
+
+from variables import SRC, DST
+from modules.exifwriter import exiftool_session
+from modules.pipeline import run_ingest, IngestError
+
+
+def send_event(wfile, **event):
+    wfile.write((json.dumps(event, ensure_ascii=False) + '\n').encode('utf-8'))
+    wfile.flush()
+
+
+class JobStreamHandler(logging.Handler):
+    """Forward log records of the running job to the submitting client."""
+
+    def __init__(self, wfile):
+        super().__init__()
+        self.wfile = wfile
+        self.setFormatter(logging.Formatter('%(message)s'))
+
+    def emit(self, record):
+        try:
+            send_event(self.wfile, event='log', level=record.levelname, message=self.format(record))
+        except OSError:
+            # Client went away; the job keeps running and still logs to file
+            pass
+
+
+class IngestRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line.decode('utf-8'))
+        except ValueError as e:
+            send_event(self.wfile, event='error', message=f'invalid request: {e}')
+            return
+
+        action = request.get('action', 'ingest')
+        if action == 'ping':
+            send_event(self.wfile, event='result', ok=True, summary={'pid': os.getpid()})
+        elif action == 'shutdown':
+            send_event(self.wfile, event='result', ok=True, summary={})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        elif action == 'ingest':
+            self.run_job(request)
+        else:
+            send_event(self.wfile, event='error', message=f'unknown action: {action}')
+
+    def run_job(self, request):
+        src = request.get('src') or SRC
+        dst = request.get('dst') or DST
+
+        # One job at a time: jobs share the destination tree and the exiftool session
+        with self.server.job_lock:
+            # Job number keeps log and skipped folder apart for jobs within the same second
+            self.server.job_count += 1
+            date_suffix = datetime.now(timezone.utc).astimezone().strftime("%Y-%m-%dT%H%M%S")
+            date_suffix = f"{date_suffix}-{self.server.job_count}"
+            log_dir = os.path.join(dst, "__log__")
+            os.makedirs(log_dir, exist_ok=True)
+            log_file = os.path.join(log_dir, f"ingest_{date_suffix}.log")
+
+            file_handler = logging.FileHandler(log_file, encoding='utf-8')
+            file_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
+            stream_handler = JobStreamHandler(self.wfile)
+            root = logging.getLogger()
+            root.addHandler(file_handler)
+            root.addHandler(stream_handler)
+
+            logger = self.server.logger
+            try:
+                logger.info("Starting ingest")
+                logger.info(f"SRC={src} DST={dst}")
+                summary = run_ingest(
+                    src, dst,
+                    author_code=request.get('author_code'),
+                    skip_metadata=bool(request.get('skip_metadata')),
+                    metadata_only=bool(request.get('metadata_only')),
+                    dry_run=bool(request.get('dry_run')),
+                    log_file=log_file,
+                    date_suffix=date_suffix,
+                    logger=logger,
+                )
+                send_event(self.wfile, event='result', ok=True, summary=summary)
+            except IngestError as e:
+                logger.error("%s", e)
+                send_event(self.wfile, event='error', message=str(e))
+            except Exception as e:
+                logger.exception("Ingest job failed")
+                send_event(self.wfile, event='error', message=str(e))
+            finally:
+                root.removeHandler(stream_handler)
+                root.removeHandler(file_handler)
+                file_handler.close()
+
+
+class IngestServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, logger):
+        self.logger = logger
+        self.job_lock = threading.Lock()
+        self.job_count = 0
+        super().__init__(socket_path, IngestRequestHandler)
+
+
+def is_service_running(socket_path):
+    """Return True if something accepts connections on socket_path."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            return False
+    return True
+
+
+def serve(socket_path, logger=None):
+    """
+    Run the resident service on socket_path until a shutdown request arrives.
+
+    Returns False without starting if another service already owns the socket.
+    """
+    if logger is None:
+        logger = logging.getLogger('ingest')
+
+    if os.path.exists(socket_path):
+        if is_service_running(socket_path):
+            logger.error("Ingest service already running on %s", socket_path)
+            return False
+        # Stale socket from a crashed run
+        os.unlink(socket_path)
+
+    with exiftool_session(), IngestServer(socket_path, logger) as server:
+        logger.info("Ingest service listening on %s", socket_path)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(socket_path)
+            logger.info("Ingest service stopped")
+    return True
@@ -0,0 +1,124 @@
+import os
+import sys
+
+import pytest
+from PIL import Image
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from modules import imageops
+from modules.imageops import derivative_settings_hash
+from modules.derivatives import (
+    DerivativeIndex,
+    derivative_location,
+    find_stale_derivatives,
+    is_stale,
+    rebuild_derivatives,
+)
+
+SETTINGS = 'settings-a'
+
+
+def new_summary():
+    return {'checked': 0, 'unreadable': 0, 'stale': 0, 'rebuilt': 0, 'failed': 0}
+
+
+def touch(path, mtime):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb'):
+        pass
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """Two primaries, each with a derivative newer than it."""
+    dst = str(tmp_path)
+    primaries = []
+    for name in ('a.tif', 'b.tif'):
+        primary = touch(os.path.join(dst, 'primary', 'gemaelde', 'sub', name), 1000)
+        _, derivative = derivative_location(dst, primary)
+        touch(derivative, 2000)
+        primaries.append(primary)
+    index = DerivativeIndex(dst)
+    yield dst, index, primaries
+    index.close()
+
+
+def stale_paths(dst, index, settings_hash=SETTINGS, force=False):
+    return [t[0] for t in find_stale_derivatives(dst, index, settings_hash, new_summary(), force=force)]
+
+
+def test_derivative_location_mirrors_primary(tmp_path):
+    dst = str(tmp_path)
+    primary = os.path.join(dst, 'primary', 'gemaelde', 'sub', 'x.tif')
+    assert derivative_location(dst, primary) == (
+        os.path.join(dst, 'derivative', 'gemaelde', 'sub'),
+        os.path.join(dst, 'derivative', 'gemaelde', 'sub', 'x.jpg'),
+    )
+
+
+def test_is_stale(tmp_path):
+    derivative = touch(str(tmp_path / 'x.jpg'), 2000)
+    assert is_stale(1000, str(tmp_path / 'missing.jpg'), (1000, SETTINGS), SETTINGS)
+    assert is_stale(3000, derivative, (3000, SETTINGS), SETTINGS)
+    assert not is_stale(1000, derivative, None, SETTINGS)
+    assert is_stale(1000, derivative, None, SETTINGS, force=True)
+    assert not is_stale(1000, derivative, (1000, SETTINGS), SETTINGS, force=True)
+    assert is_stale(1000, derivative, (999, SETTINGS), SETTINGS)
+    assert is_stale(1000, derivative, (1000, 'settings-b'), SETTINGS)
+
+
+def test_settings_hash_change_makes_recorded_derivatives_stale(archive):
+    dst, index, primaries = archive
+    for primary in primaries:
+        index.record(primary, 1000, SETTINGS)
+    assert stale_paths(dst, index) == []
+    assert stale_paths(dst, index, settings_hash='settings-b') == primaries
+
+
+def test_settings_hash_tracks_encoding(monkeypatch):
+    before = derivative_settings_hash.__wrapped__()
+    assert derivative_settings_hash.__wrapped__() == before
+    monkeypatch.setattr(imageops, 'JPEG_QUALITY', imageops.JPEG_QUALITY - 1)
+    assert derivative_settings_hash.__wrapped__() != before
+
+
+def test_force_resumes_after_interruption(archive):
+    dst, index, primaries = archive
+    assert stale_paths(dst, index) == []
+    assert stale_paths(dst, index, force=True) == primaries
+    # First file finished before the interruption
+    index.record(primaries[0], 1000, SETTINGS)
+    assert stale_paths(dst, index, force=True) == primaries[1:]
+
+
+def test_unreadable_primary_is_counted_and_skipped(archive):
+    dst, index, primaries = archive
+    os.symlink(os.path.join(dst, 'nowhere.tif'), os.path.join(dst, 'primary', 'gemaelde', 'sub', 'broken.tif'))
+    summary = new_summary()
+    todo = find_stale_derivatives(dst, index, SETTINGS, summary, force=True)
+    assert [t[0] for t in todo] == primaries
+    assert summary['checked'] == 2
+    assert summary['unreadable'] == 1
+
+
+def test_failed_metadata_copy_is_not_recorded(tmp_path, monkeypatch):
+    dst = str(tmp_path)
+    primary = os.path.join(dst, 'primary', 'gemaelde', 'sub', 'x.tif')
+    os.makedirs(os.path.dirname(primary))
+    Image.new('RGB', (8, 8)).save(primary, 'TIFF')
+    # No exiftool on PATH: the metadata copy fails in the worker
+    monkeypatch.setenv('PATH', str(tmp_path / 'empty'))
+
+    summary = rebuild_derivatives(dst, workers=1)
+    assert (summary['rebuilt'], summary['failed']) == (0, 1)
+    assert not os.path.exists(derivative_location(dst, primary)[1])
+    index = DerivativeIndex(dst)
+    try:
+        assert index.all() == {}
+    finally:
+        index.close()
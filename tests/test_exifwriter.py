@@ -0,0 +1,150 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from modules import exifwriter
+from modules.exifwriter import ExifToolSession, run_exiftool, read_current_values, changed_metadata_args
+from modules.metadata import load_preset_for_code
+from variables import required_metadata_tags
+
+RESOURCES_DIR = os.path.join(PROJECT_ROOT, 'resources')
+
+# `exiftool -j -G1` output for a file written with the BLM preset: one-item
+# lists, a JSON number and no CreateDate (the blank preset date is not written)
+BLM_JSON = '''[{
+  "SourceFile": "/archive/primary/BLM_0001.tif",
+  "XMP-dc:Creator": ["Max Blumenschein"],
+  "XMP-dc:Rights": "Kunstmuseum Basel",
+  "XMP-dc:Relation": ["Wissenschaftliche Fotografie am Kunstmuseum Basel \u2013 Standards (Version 1.1.0)"],
+  "XMP-photoshop:AuthorsPosition": "Wissenschaftliche Fotografin",
+  "XMP-iptcCore:CreatorAddress": "St. Alban-Graben 8",
+  "XMP-iptcCore:CreatorCity": "Basel",
+  "XMP-iptcCore:CreatorPostalCode": 4010,
+  "XMP-iptcCore:CreatorCountry": "Schweiz",
+  "XMP-iptcCore:CreatorWorkEmail": "max.blumenschein@bs.ch",
+  "XMP-iptcCore:CreatorWorkTelephone": "+41 61 206 62 62",
+  "XMP-iptcCore:CreatorWorkURL": "kunstmuseumbasel.ch"
+}]'''
+
+# Minimal stand-in for `exiftool -stay_open True -@ -`: -echo4 goes to stderr,
+# -executeNUM prints {readyNUM}; -bigwarn floods stderr and -die exits mid-command
+FAKE_EXIFTOOL = textwrap.dedent('''\
+    #!{python}
+    import sys
+    args = []
+    for line in sys.stdin:
+        arg = line.rstrip('\\n')
+        if args[-1:] == ['-stay_open'] and arg == 'False':
+            sys.exit(0)
+        if not arg.startswith('-execute'):
+            args.append(arg)
+            continue
+        status = 0
+        echo = None
+        i = 0
+        while i < len(args):
+            if args[i] == '-echo4':
+                echo = args[i + 1]
+                i += 1
+            elif args[i] == '-bigwarn':
+                sys.stderr.write(('Warning: ' + 'x' * 200 + '\\n') * 5000)
+            elif args[i] == '-die':
+                sys.exit(1)
+            elif args[i] == '-fail':
+                sys.stderr.write('Error: failed\\n')
+                status = 1
+            else:
+                sys.stdout.write(args[i] + '\\n')
+            i += 1
+        sys.stdout.write('{{ready' + arg[len('-execute'):] + '}}\\n')
+        sys.stdout.flush()
+        if echo is not None:
+            sys.stderr.write(echo.replace('${{status}}', str(status)) + '\\n')
+        sys.stderr.flush()
+        args = []
+''')
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    script = tmp_path / 'exiftool'
+    script.write_text(FAKE_EXIFTOOL.format(python=sys.executable))
+    script.chmod(0o755)
+    monkeypatch.setenv('PATH', f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    s = ExifToolSession()
+    s.start()
+    monkeypatch.setattr(exifwriter, '_session', s)
+    yield s
+    s.close()
+
+
+def test_session_returns_output_and_status(session):
+    assert session.execute(['hello']) == (0, 'hello\n', '')
+    returncode, _, stderr = session.execute(['-fail'])
+    assert returncode == 1
+    assert stderr == 'Error: failed\n'
+
+
+def test_large_stderr_does_not_block(session):
+    returncode, stdout, stderr = session.execute(['-bigwarn', 'done'])
+    assert returncode == 0
+    assert stdout == 'done\n'
+    assert stderr.count('Warning') == 5000
+
+
+def test_dead_session_raises_and_restarts(session):
+    with pytest.raises(subprocess.CalledProcessError):
+        run_exiftool(['-die'])
+    assert session.proc is None
+    assert run_exiftool(['again']).stdout == 'again\n'
+
+
+def read_json(monkeypatch, stdout, path='/archive/primary/BLM_0001.tif'):
+    """Run read_current_values against canned exiftool output."""
+    monkeypatch.setattr(exifwriter, 'run_exiftool',
+                        lambda args: subprocess.CompletedProcess(['exiftool'] + args, 0, stdout, ''))
+    return read_current_values([path], [])[path]
+
+
+def test_blm_preset_reads_back_unchanged(monkeypatch):
+    preset = load_preset_for_code('BLM', RESOURCES_DIR, required_metadata_tags)
+    assert changed_metadata_args(preset, read_json(monkeypatch, BLM_JSON)) is None
+
+
+def test_only_differing_tags_are_written(monkeypatch):
+    preset = load_preset_for_code('BLM', RESOURCES_DIR, required_metadata_tags)
+    current = read_json(monkeypatch, BLM_JSON.replace('"Basel"', '"Zürich"'))
+    assert changed_metadata_args(preset, current) == [
+        '-overwrite_original', '-charset', 'filename=UTF8', '-XMP-iptcCore:CreatorCity=Basel',
+    ]
+
+
+def test_numbers_compare_as_printed(monkeypatch):
+    current = read_json(monkeypatch, '[{"SourceFile": "/archive/primary/BLM_0001.tif", "XMP-xmp:Rating": 1.10}]')
+    assert current == {'XMP-xmp:Rating': '1.10'}
+    assert changed_metadata_args(['-XMP-xmp:Rating=1.10'], current) is None
+
+
+@pytest.mark.parametrize('preset_value,read_back', [
+    ('2025-01-13', '2025:01:13'),
+    ('2025-01-13T10:30', '2025:01:13 10:30'),
+    ('2025-01-13T10:30:00+01:00', '2025:01:13 10:30:00+01:00'),
+    ('2025-01-13T10:30:00+0100', '2025:01:13 10:30:00+01:00'),
+    ('2025-01-13T10:30:00Z', '2025:01:13 10:30:00Z'),
+    ('2025:01:13 10:30:00', '2025:01:13 10:30:00'),
+])
+def test_dates_compare_in_exiftool_form(monkeypatch, preset_value, read_back):
+    current = read_json(monkeypatch, f'[{{"SourceFile": "/archive/primary/BLM_0001.tif", "XMP-xmp:CreateDate": "{read_back}"}}]')
+    assert changed_metadata_args([f'-XMP-xmp:CreateDate={preset_value}'], current) is None
+
+
+def test_blank_date_replaces_existing_value():
+    current = {'XMP-xmp:CreateDate': '2025:01:13 10:30:00'}
+    assert changed_metadata_args(['-XMP-xmp:CreateDate= '], current) == ['-XMP-xmp:CreateDate= ']
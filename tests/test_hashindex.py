@@ -0,0 +1,151 @@
+import os
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from modules import hashindex
+from modules.hashindex import HashIndex, BLOCK_SIZE, INDEX_DIR, INDEX_FILE, rebuild_index
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as fh:
+        fh.write(data)
+    return str(path)
+
+
+def content(middle=b'a', size=3 * BLOCK_SIZE):
+    """Same first and last block for every middle byte, so only the full hash tells them apart."""
+    return b'h' * BLOCK_SIZE + middle * (size - 2 * BLOCK_SIZE) + b't' * BLOCK_SIZE
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    counts = {'quick': 0, 'full': 0}
+
+    def counting(name, func):
+        def wrapper(*args, **kwargs):
+            counts[name] += 1
+            return func(*args, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(hashindex, 'quick_hash', counting('quick', hashindex.quick_hash))
+    monkeypatch.setattr(hashindex, 'full_hash', counting('full', hashindex.full_hash))
+    return counts
+
+
+@pytest.fixture
+def index(tmp_path):
+    idx = HashIndex(str(tmp_path / 'dst'))
+    yield idx
+    idx.close()
+
+
+def archived(tmp_path, index, name, data):
+    path = write(tmp_path / 'dst' / 'primary' / 'a' / name, data)
+    index.add(path)
+    return path
+
+
+def test_different_size_needs_no_hashing(tmp_path, index, calls):
+    archived(tmp_path, index, 'x.tif', content())
+    calls.update(quick=0, full=0)
+    new = write(tmp_path / 'src' / 'y.tif', content(size=4 * BLOCK_SIZE))
+    assert index.find_duplicate(new) is None
+    assert calls == {'quick': 0, 'full': 0}
+
+
+def test_quick_hash_match_is_confirmed_by_full_hash(tmp_path, index, calls):
+    archived(tmp_path, index, 'x.tif', content(b'a'))
+    calls.update(quick=0, full=0)
+    different = write(tmp_path / 'src' / 'y.tif', content(b'b'))
+    assert index.find_duplicate(different) is None
+    assert calls == {'quick': 1, 'full': 1}
+
+    same = write(tmp_path / 'src' / 'z.tif', content(b'a'))
+    assert index.find_duplicate(same) == os.path.join('primary', 'a', 'x.tif')
+
+
+def test_duplicates_within_one_batch(tmp_path, index):
+    first = write(tmp_path / 'src' / 'one.tif', content())
+    second = write(tmp_path / 'src' / 'two.tif', content())
+    other = write(tmp_path / 'src' / 'three.tif', content(b'b'))
+    assert index.find_duplicate(first) is None
+    index.reserve(first)
+    assert index.find_duplicate(second) == first
+    assert index.find_duplicate(other) is None
+
+
+def test_add_replaces_rows_for_the_path(tmp_path, index):
+    path = archived(tmp_path, index, 'x.tif', content(b'a'))
+    write(path, content(b'b', size=4 * BLOCK_SIZE))
+    index.add(path)
+    assert index.db.execute('SELECT COUNT(*) FROM hashes').fetchone()[0] == 1
+
+
+def test_metadata_write_keeps_delivered_row(tmp_path, index):
+    path = archived(tmp_path, index, 'x.tif', content())
+    with open(path, 'ab') as fh:
+        fh.write(b'metadata')
+    index.update_file_state(path)
+    again = write(tmp_path / 'src' / 'x.tif', content())
+    assert index.find_duplicate(again) == os.path.join('primary', 'a', 'x.tif')
+
+
+@pytest.mark.parametrize('replacement', [content(b'b'), content(b'b', size=4 * BLOCK_SIZE)],
+                         ids=['same-size', 'other-size'])
+def test_replaced_file_is_no_longer_a_duplicate(tmp_path, index, replacement):
+    path = archived(tmp_path, index, 'x.tif', content(b'a'))
+    st = os.stat(path)
+    write(path, replacement)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    redelivered = write(tmp_path / 'src' / 'x.tif', content(b'a'))
+    assert index.find_duplicate(redelivered) is None
+    assert index.db.execute('SELECT COUNT(*) FROM hashes').fetchone()[0] == 0
+
+
+def test_rebuild_drops_delivered_rows_of_replaced_files(tmp_path, index):
+    dst = str(tmp_path / 'dst')
+    path = archived(tmp_path, index, 'x.tif', content(b'a'))
+    st = os.stat(path)
+    write(path, content(b'b'))
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert rebuild_index(dst, workers=1) == 1
+
+    fresh = HashIndex(dst)
+    try:
+        assert fresh.find_duplicate(write(tmp_path / 'src' / 'x.tif', content(b'a'))) is None
+        assert fresh.find_duplicate(write(tmp_path / 'src' / 'y.tif', content(b'b'))) == os.path.join('primary', 'a', 'x.tif')
+    finally:
+        fresh.close()
+
+
+def test_rebuild_skips_unchanged_files(tmp_path, index):
+    archived(tmp_path, index, 'x.tif', content())
+    assert rebuild_index(str(tmp_path / 'dst'), workers=1) == 0
+
+
+def test_read_only_does_not_create_index(tmp_path):
+    dst = tmp_path / 'dst'
+    idx = HashIndex(str(dst), read_only=True)
+    try:
+        assert idx.find_duplicate(write(tmp_path / 'src' / 'x.tif', content())) is None
+    finally:
+        idx.close()
+    assert not (dst / INDEX_DIR).exists()
+
+
+def test_read_only_leaves_stale_rows(tmp_path, index):
+    path = archived(tmp_path, index, 'x.tif', content(b'a'))
+    os.remove(path)
+    idx = HashIndex(str(tmp_path / 'dst'), read_only=True)
+    try:
+        assert idx.find_duplicate(write(tmp_path / 'src' / 'x.tif', content(b'a'))) is None
+    finally:
+        idx.close()
+    assert index.db.execute('SELECT COUNT(*) FROM hashes').fetchone()[0] == 1
+    assert os.path.exists(os.path.join(str(tmp_path / 'dst'), INDEX_DIR, INDEX_FILE))
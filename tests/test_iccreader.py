@@ -0,0 +1,77 @@
+import glob
+import io
+import os
+import sys
+
+import pytest
+from PIL import Image, ImageCms
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from modules.iccreader import read_icc_description
+
+PROFILES = sorted(glob.glob(os.path.join(PROJECT_ROOT, 'resources', '*.icc')))
+FORMATS = [('TIFF', '.tiff'), ('JPEG', '.jpg'), ('PNG', '.png')]
+
+
+def profile_image(profile_path):
+    """Small image in the profile's colour space, plus the description Pillow reports."""
+    with open(profile_path, 'rb') as fh:
+        icc = fh.read()
+    profile = ImageCms.ImageCmsProfile(io.BytesIO(icc))
+    mode = 'L' if profile.profile.xcolor_space.strip() == 'GRAY' else 'RGB'
+    expected = ImageCms.getProfileDescription(profile).strip()
+    return Image.new(mode, (8, 8)), icc, expected
+
+
+@pytest.mark.parametrize('fmt,ext', FORMATS)
+@pytest.mark.parametrize('profile_path', PROFILES, ids=os.path.basename)
+def test_description_matches_pillow(tmp_path, profile_path, fmt, ext):
+    img, icc, expected = profile_image(profile_path)
+    path = tmp_path / f'image{ext}'
+    img.save(path, fmt, icc_profile=icc)
+    assert read_icc_description(str(path)) == expected
+
+
+@pytest.mark.parametrize('fmt,ext', FORMATS)
+def test_no_embedded_profile(tmp_path, fmt, ext):
+    path = tmp_path / f'image{ext}'
+    Image.new('RGB', (8, 8)).save(path, fmt)
+    assert read_icc_description(str(path)) == ''
+
+
+def test_unhandled_format_falls_back(tmp_path):
+    path = tmp_path / 'image.bmp'
+    Image.new('RGB', (8, 8)).save(path, 'BMP')
+    assert read_icc_description(str(path)) is None
+
+
+def test_jpeg_fill_bytes_before_marker(tmp_path):
+    img, icc, expected = profile_image(os.path.join(PROJECT_ROOT, 'resources', 'eciRGB_v2.icc'))
+    buf = io.BytesIO()
+    img.save(buf, 'JPEG', icc_profile=icc)
+    data = buf.getvalue()
+    path = tmp_path / 'fill.jpg'
+    path.write_bytes(data[:2] + b'\xff\xff' + data[2:])
+    assert read_icc_description(str(path)) == expected
+
+
+def test_jpeg_garbage_falls_back(tmp_path):
+    img, icc, _ = profile_image(os.path.join(PROJECT_ROOT, 'resources', 'eciRGB_v2.icc'))
+    buf = io.BytesIO()
+    img.save(buf, 'JPEG', icc_profile=icc)
+    path = tmp_path / 'garbage.jpg'
+    path.write_bytes(buf.getvalue()[:2] + b'\x00\x00' + buf.getvalue()[2:])
+    assert read_icc_description(str(path)) is None
+
+
+@pytest.mark.parametrize('fmt,ext', FORMATS)
+def test_truncated_file_falls_back(tmp_path, fmt, ext):
+    img, icc, _ = profile_image(os.path.join(PROJECT_ROOT, 'resources', 'eciRGB_v2.icc'))
+    buf = io.BytesIO()
+    img.save(buf, fmt, icc_profile=icc)
+    path = tmp_path / f'truncated{ext}'
+    path.write_bytes(buf.getvalue()[:20])
+    assert read_icc_description(str(path)) is None
@@ -11,6 +11,18 @@ SKIPPED = 'skipped_files'
 #  - "auto"   = current behavior (id if present, otherwise prefix)
 SUBDIR_MODE = 'prefix'
 
+# Content-hash duplicate check against DST/primary:
+#  - "skip" = move duplicates to the skipped folder
+#  - "flag" = log duplicates but ingest them anyway
+#  - "off"  = no duplicate check
+DUPLICATE_MODE = 'skip'
+
+# Parallel workers for --rebuild-index and --rebuild-derivatives
+WORKERS = min(4, os.cpu_count() or 1)
+
+# Unix socket of the resident service (ingest.py --serve / ingest_client.py)
+SOCKET_PATH = os.path.join(script_dir, 'ingest.sock')
+
 # load resources
 with open(os.path.join(script_dir, 'resources', 'ms-zustaendigkeit.txt'), encoding='utf-8') as f:
     valid_first_segment_first_char = [line.strip() for line in f if line.strip()]